@@ -2,40 +2,254 @@
 """
 Comprehensive Airtable Relationship Analysis
 Analyzes the complete IRIS+ framework structure and unique relationship counts
+
+Dependencies: pip install -r requirements-analysis.txt
 """
 
-import requests
-import json
+import asyncio
+import hashlib
+import itertools
+import operator
+import os
+import sys
+import time
 from collections import defaultdict, Counter
+from pathlib import Path
+
+import aiohttp
+import ijson
+from aiolimiter import AsyncLimiter
+import orjson
+from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+# Load environment variables
+load_dotenv()
 
 # Configuration
-AIRTABLE_TOKEN = "patcrGNiYinMzvMpm.f37d63cd3a8e6d894197bd66eb0558a1feb4e7136ac9afdec2b3f866b08a0507"
-BASE_ID = "app8JW20fqXYI2uRw"
-HEADERS = {"Authorization": f"Bearer {AIRTABLE_TOKEN}"}
+AIRTABLE_TOKEN = os.getenv("AIRTABLE_TOKEN")
+if not AIRTABLE_TOKEN:
+    sys.exit("❌ Error: AIRTABLE_TOKEN is not set; add it to .env (see .env.example)")
+BASE_ID = os.getenv("AIRTABLE_BASE_ID", "app8JW20fqXYI2uRw")
+HEADERS = {
+    "Authorization": f"Bearer {AIRTABLE_TOKEN}",
+    # Compressed JSON is a fraction of the bytes; aiohttp decompresses it
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# Lookup fields on the Data Needed junction table
+CATEGORY_LOOKUP_FIELD = 'IRIS Impact Category (from Impact Category <> Impact Theme) (from IRIS Impact Themes) (from IRIS Strategic Goals) (from <> IRIS Key Dimensions) (from <> IRIS Core Metric Set) (from <> IRIS Key Indicator)'
+SDG_LOOKUP_FIELD = 'SDG (from IRIS Strategic Goals) (from <> IRIS Key Dimensions) (from <> IRIS Core Metric Set) (from <> IRIS Key Indicator)'
+DATA_NEEDED_FIELD = 'IRIS Data Needed'
+JUNCTION_FIELDS = [CATEGORY_LOOKUP_FIELD, SDG_LOOKUP_FIELD, DATA_NEEDED_FIELD]
+
+# Fields on the IRIS Strategic Goals table
+GOAL_THEMES_FIELD = 'IRIS Impact Themes'
+GOAL_SDG_FIELD = 'SDG'
+GOAL_FIELDS = [GOAL_THEMES_FIELD, GOAL_SDG_FIELD]
+
+# Bits per record number when packing pairs and triplets into one int
+ID_BITS = 21
+
+# Airtable allows 5 requests per second per base; the semaphore bounds
+# pages in flight and the limiter spaces out request starts
+MAX_CONCURRENT_REQUESTS = 5
+RATE_LIMITER = AsyncLimiter(5, 1)
+
+# Seconds an idle pooled connection stays open for the next page
+KEEPALIVE_TIMEOUT = 30
+
+# Set AIRTABLE_CACHE_TTL to a number of seconds to cache fetched tables
+# locally and let repeat runs read them instead of refetching
+CACHE_DIR = Path(__file__).parent / ".cache" / "airtable"
+CACHE_TTL_SECONDS = int(os.getenv("AIRTABLE_CACHE_TTL", 0))
+
+# Largest page Airtable will return; fewer pages means fewer round trips
+PAGE_SIZE = 100
 
-def fetch_all_records(table_id):
-    """Fetch all records from a table, handling pagination"""
+def _is_rate_limited(error):
+    """Retry only when Airtable rejects a request with 429 Too Many Requests"""
+    return isinstance(error, aiohttp.ClientResponseError) and error.status == 429
+
+@retry(
+    retry=retry_if_exception(_is_rate_limited),
+    # Airtable asks clients to wait 30 seconds after a 429; back off
+    # 30s, 60s, then 120s for each later attempt
+    wait=wait_exponential(multiplier=30, min=30, max=120),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+async def open_page(session, semaphore, table_id, offset=None, fields=None):
+    """Request a single page of records from a table, leaving the body unread
+
+    On success the caller owns a semaphore slot and must release it once the
+    body is read; on failure the slot is released before any retry sleeps.
+    """
     url = f"https://api.airtable.com/v0/{BASE_ID}/{table_id}"
-    all_records = []
+    params = [("pageSize", PAGE_SIZE)]
+    # Only return the named fields; Airtable returns every field otherwise
+    params.extend(("fields[]", field) for field in fields or [])
+    if offset:
+        params.append(("offset", offset))
     
-    while url:
-        response = requests.get(url, headers=HEADERS)
+    await semaphore.acquire()
+    try:
+        async with RATE_LIMITER:
+            response = await session.get(url, params=params)
         response.raise_for_status()
-        data = response.json()
+    except BaseException:
+        semaphore.release()
+        raise
+    return response
+
+async def iter_records(session, semaphore, table_id, fields=None):
+    """Stream records from a table, served from the local cache while it is fresh"""
+    if CACHE_TTL_SECONDS <= 0:
+        async for record in fetch_records(session, semaphore, table_id, fields):
+            yield record
+        return
+    
+    cache_name = table_id
+    if fields:
+        cache_name += "-" + hashlib.sha1("\0".join(fields).encode()).hexdigest()[:12]
+    cache_path = CACHE_DIR / f"{cache_name}.jsonl"
+    
+    # Cache files hold one orjson-encoded record per line; live responses are
+    # parsed by ijson as they stream, so orjson only serves this cache
+    cache_age = time.time() - cache_path.stat().st_mtime if cache_path.exists() else None
+    if cache_age is not None and cache_age < CACHE_TTL_SECONDS:
+        print(f"  ✓ {table_id} served from cache (age {cache_age / 3600:.1f}h)")
+        with cache_path.open("rb") as cache_file:
+            for line in cache_file:
+                yield orjson.loads(line)
+        return
+    
+    # Write to a temporary file and swap it in only once the table is complete
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    partial_path = cache_path.with_suffix(".jsonl.partial")
+    try:
+        with partial_path.open("wb") as cache_file:
+            async for record in fetch_records(session, semaphore, table_id, fields):
+                cache_file.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+                yield record
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    os.replace(partial_path, cache_path)
+
+async def fetch_records(session, semaphore, table_id, fields=None):
+    """Stream records from Airtable one at a time, handling pagination"""
+    offset = None
+    
+    while True:
+        page_offset = None
+        builder = None
         
-        records = data.get("records", [])
-        all_records.extend(records)
+        response = await open_page(session, semaphore, table_id, offset, fields)
+        try:
+            async with response:
+                # Parse the page incrementally so no full page is ever held
+                async for prefix, event, value in ijson.parse_async(response.content, use_float=True):
+                    if prefix == "offset":
+                        page_offset = value
+                        continue
+                    
+                    if prefix == "records.item" and event == "start_map":
+                        builder = ijson.ObjectBuilder()
+                    if builder is None:
+                        continue
+                    
+                    builder.event(event, value)
+                    if prefix == "records.item" and event == "end_map":
+                        yield builder.value
+                        builder = None
+        finally:
+            semaphore.release()
         
         # Check for pagination
-        offset = data.get("offset")
-        if offset:
-            url = f"https://api.airtable.com/v0/{BASE_ID}/{table_id}?offset={offset}"
-        else:
-            url = None
+        offset = page_offset
+        if not offset:
+            return
+
+async def count_records(records):
+    """Count streamed records without keeping them"""
+    count = 0
+    async for _ in records:
+        count += 1
+    return count
+
+async def analyze_goals(records):
+    """Collect theme/goal and goal/SDG pairs from streamed goal records in one pass"""
+    record_count = 0
+    theme_goal_pairs = set()
+    goal_sdg_pairs = set()
+    
+    async for record in records:
+        record_count += 1
+        goal_id = record['id']
+        fields = record.get('fields', {})
+        theme_goal_pairs.update((theme_id, goal_id) for theme_id in fields.get(GOAL_THEMES_FIELD, []))
+        goal_sdg_pairs.update((goal_id, sdg_id) for sdg_id in fields.get(GOAL_SDG_FIELD, []))
     
-    return all_records
+    return record_count, theme_goal_pairs, goal_sdg_pairs
 
-def analyze_relationship_chain():
+async def analyze_data_needed_junction(records):
+    """Fold streamed Data Needed junction records into unique combination sets"""
+    record_count = 0
+    category_combinations = set()
+    sdg_combinations = set()
+    full_chain_combinations = set()
+    
+    # Record IDs are numbered so each pair or triplet is stored as one
+    # packed int instead of a tuple of long ID strings
+    record_numbers = {}
+    
+    def number(record_id):
+        return record_numbers.setdefault(record_id, len(record_numbers))
+    
+    # Many junction records share the same lookup IDs, often repeated or in
+    # a different order; their cross products add nothing new, so each
+    # distinct set of IDs is expanded once
+    seen_fan_outs = set()
+    
+    async for record in records:
+        record_count += 1
+        fields = record.get('fields', {})
+        
+        # Extract categories from lookup field
+        categories = frozenset(map(number, fields.get(CATEGORY_LOOKUP_FIELD, [])))
+        
+        # Extract SDGs from lookup field
+        sdgs = frozenset(map(number, fields.get(SDG_LOOKUP_FIELD, [])))
+        
+        # Get direct relationships
+        data_needed = frozenset(map(number, fields.get(DATA_NEEDED_FIELD, [])))
+        
+        fan_out = (categories, sdgs, data_needed)
+        if fan_out in seen_fan_outs:
+            continue
+        seen_fan_outs.add(fan_out)
+        
+        # Shift the leading IDs once so each combination is a single OR
+        category_keys = [category << ID_BITS for category in categories]
+        sdg_keys = [sdg << ID_BITS for sdg in sdgs]
+        chain_keys = [(category | sdg) << ID_BITS for category, sdg in itertools.product(category_keys, sdgs)]
+        
+        # Count unique category-data_needed pairs
+        category_combinations.update(itertools.starmap(operator.or_, itertools.product(category_keys, data_needed)))
+        
+        # Count unique SDG-data_needed pairs
+        sdg_combinations.update(itertools.starmap(operator.or_, itertools.product(sdg_keys, data_needed)))
+        
+        # Count full chain combinations (category + SDG + data_needed)
+        full_chain_combinations.update(itertools.starmap(operator.or_, itertools.product(chain_keys, data_needed)))
+    
+    if len(record_numbers) > 1 << ID_BITS:
+        raise ValueError(f"{len(record_numbers)} distinct record IDs do not fit in {ID_BITS} bits")
+    
+    return record_count, category_combinations, sdg_combinations, full_chain_combinations
+
+async def analyze_relationship_chain():
     """Analyze the complete IRIS+ relationship chain and count unique pairs"""
     
     print("🔍 Analyzing IRIS+ Relationship Chain from Airtable")
@@ -59,89 +273,64 @@ def analyze_relationship_chain():
         "junct_data_needed": "tblyCxOkCo3esnHBg" # <> IRIS Data Needed
     }
     
-    # Fetch all data
+    # Goals and the Data Needed junction are folded as they stream in;
+    # every other table is just counted
+    counted_tables = [name for name in tables if name not in ("goals", "junct_data_needed")]
+    
+    # Fetch all tables concurrently over a shared session
     print("\n📥 Fetching all table data...")
-    data = {}
-    for name, table_id in tables.items():
-        print(f"  Fetching {name}...")
-        data[name] = fetch_all_records(table_id)
-        print(f"    ✓ {len(data[name])} records")
+    print(f"  Analyzing Data Needed junction table with full lookup context...")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # Pool no more connections than requests can be in flight, and keep them
+    # open between pages so each socket pays the TLS handshake only once
+    connector = aiohttp.TCPConnector(
+        limit_per_host=MAX_CONCURRENT_REQUESTS,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        goal_analysis, junction_analysis, *table_counts = await asyncio.gather(
+            analyze_goals(iter_records(session, semaphore, tables["goals"], GOAL_FIELDS)),
+            analyze_data_needed_junction(
+                iter_records(session, semaphore, tables["junct_data_needed"], JUNCTION_FIELDS)
+            ),
+            *[count_records(iter_records(session, semaphore, tables[name])) for name in counted_tables],
+        )
     
-    print(f"\n📊 Record Counts Summary:")
-    print(f"  Categories: {len(data['categories'])}")
-    print(f"  Themes: {len(data['themes'])}")  
-    print(f"  Strategic Goals: {len(data['goals'])}")
-    print(f"  Key Indicators: {len(data['key_indicators'])}")
-    print(f"  Data Needed: {len(data['data_needed'])}")
-    print(f"  SDGs: {len(data['sdgs'])}")
+    (
+        junction_count,
+        category_combinations,
+        sdg_combinations,
+        full_chain_combinations,
+    ) = junction_analysis
+    goal_count, theme_goal_pairs, goal_sdg_pairs = goal_analysis
     
-    print(f"\n🔗 Junction Table Record Counts:")
-    print(f"  Key Dimensions Junction: {len(data['junct_key_dims'])}")
-    print(f"  Core Metric Sets Junction: {len(data['junct_core_sets'])}")  
-    print(f"  Key Indicators Junction: {len(data['junct_indicators'])}")
-    print(f"  Data Needed Junction: {len(data['junct_data_needed'])}")
+    counts = dict(zip(counted_tables, table_counts))
+    counts["goals"] = goal_count
+    counts["junct_data_needed"] = junction_count
+    for name in tables:
+        print(f"  ✓ {name}: {counts[name]} records")
     
-    # Analyze the complete relationship chain from Data Needed junction table
-    print(f"\n🌐 Complete Relationship Chain Analysis:")
-    print(f"  Analyzing Data Needed junction table with full lookup context...")
-    
-    # Count unique combinations in the final junction table
-    category_combinations = set()
-    sdg_combinations = set()
-    full_chain_combinations = set()
+    print(f"\n📊 Record Counts Summary:")
+    print(f"  Categories: {counts['categories']}")
+    print(f"  Themes: {counts['themes']}")
+    print(f"  Strategic Goals: {counts['goals']}")
+    print(f"  Key Indicators: {counts['key_indicators']}")
+    print(f"  Data Needed: {counts['data_needed']}")
+    print(f"  SDGs: {counts['sdgs']}")
     
-    for record in data['junct_data_needed']:
-        fields = record.get('fields', {})
-        
-        # Extract categories from lookup field
-        categories = fields.get('IRIS Impact Category (from Impact Category <> Impact Theme) (from IRIS Impact Themes) (from IRIS Strategic Goals) (from <> IRIS Key Dimensions) (from <> IRIS Core Metric Set) (from <> IRIS Key Indicator)', [])
-        
-        # Extract SDGs from lookup field  
-        sdgs = fields.get('SDG (from IRIS Strategic Goals) (from <> IRIS Key Dimensions) (from <> IRIS Core Metric Set) (from <> IRIS Key Indicator)', [])
-        
-        # Get direct relationships
-        key_indicators = fields.get('<> IRIS Key Indicator', [])
-        data_needed = fields.get('IRIS Data Needed', [])
-        
-        # Count unique category-data_needed pairs
-        for category in categories:
-            for data_item in data_needed:
-                category_combinations.add((category, data_item))
-        
-        # Count unique SDG-data_needed pairs  
-        for sdg in sdgs:
-            for data_item in data_needed:
-                sdg_combinations.add((sdg, data_item))
-                
-        # Count full chain combinations (category + SDG + data_needed)
-        for category in categories:
-            for sdg in sdgs:
-                for data_item in data_needed:
-                    full_chain_combinations.add((category, sdg, data_item))
+    print(f"\n🔗 Junction Table Record Counts:")
+    print(f"  Key Dimensions Junction: {counts['junct_key_dims']}")
+    print(f"  Core Metric Sets Junction: {counts['junct_core_sets']}")
+    print(f"  Key Indicators Junction: {counts['junct_indicators']}")
+    print(f"  Data Needed Junction: {counts['junct_data_needed']}")
     
+    # Report the complete relationship chain from Data Needed junction table
     print(f"\n🎯 Unique Relationship Pair Counts:")
     print(f"  Category ↔ Data Needed: {len(category_combinations)} unique pairs")
     print(f"  SDG ↔ Data Needed: {len(sdg_combinations)} unique pairs") 
     print(f"  Category + SDG + Data Needed: {len(full_chain_combinations)} unique triplets")
     
-    # Analyze Theme-Goal relationships
-    theme_goal_pairs = set()
-    for record in data['goals']:
-        goal_id = record['id']
-        themes = record.get('fields', {}).get('IRIS Impact Themes', [])
-        for theme_id in themes:
-            theme_goal_pairs.add((theme_id, goal_id))
-    
     print(f"  Theme ↔ Goal: {len(theme_goal_pairs)} unique pairs")
-    
-    # Analyze Goal-SDG relationships  
-    goal_sdg_pairs = set()
-    for record in data['goals']:
-        goal_id = record['id']
-        sdgs = record.get('fields', {}).get('SDG', [])
-        for sdg_id in sdgs:
-            goal_sdg_pairs.add((goal_id, sdg_id))
-            
     print(f"  Goal ↔ SDG: {len(goal_sdg_pairs)} unique pairs")
     
     print(f"\n✅ Complete Relationship Chain Verified:")
@@ -154,12 +343,12 @@ def analyze_relationship_chain():
         'full_chain_triplets': len(full_chain_combinations),
         'theme_goal_pairs': len(theme_goal_pairs),
         'goal_sdg_pairs': len(goal_sdg_pairs),
-        'total_data_needed_records': len(data['junct_data_needed'])
+        'total_data_needed_records': counts['junct_data_needed']
     }
 
 if __name__ == "__main__":
     try:
-        results = analyze_relationship_chain()
+        results = asyncio.run(analyze_relationship_chain())
         print(f"\n📋 Summary for Database Schema:")
         print(f"  Theme-Goal Junction Table: {results['theme_goal_pairs']} records")
         print(f"  Goal-SDG Junction Table: {results['goal_sdg_pairs']} records") 
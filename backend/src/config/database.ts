@@ -132,9 +132,13 @@ export async function refreshMaterializedViews(): Promise<void> {
   try {
     logger.info('Refreshing materialized views');
     
-    await prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_category_to_data_requirements`;
-    await prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_sdg_to_indicators`;
-    await prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_theme_relationships`;
+    // The views only read base tables, so they can refresh side by side
+    // on separate pooled connections
+    await Promise.all([
+      prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_category_to_data_requirements`,
+      prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_sdg_to_indicators`,
+      prisma.$executeRaw`REFRESH MATERIALIZED VIEW CONCURRENTLY mv_theme_relationships`
+    ]);
     
     logger.info('Materialized views refreshed successfully');
   } catch (error) {
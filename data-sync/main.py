@@ -6,13 +6,16 @@ Optimized Airtable to PostgreSQL synchronization with proper error handling
 
 import os
 import sys
-import time
-import schedule
+import signal
+import asyncio
 import logging
 import structlog
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 
 # Load environment variables
 load_dotenv()
@@ -114,44 +117,60 @@ class DataSyncService:
             logger.error("Failed to refresh materialized views", error=str(e), exc_info=True)
             raise
     
-    def health_check(self):
+    async def health_check(self):
         """Perform health check of sync service"""
-        try:
-            # Check database connection
-            self.database.health_check()
-            
-            # Check Airtable connectivity
-            self.airtable_sync.health_check()
-            
-            # Check last sync status
-            last_sync = self.database.get_last_sync_status()
-            if last_sync and last_sync['status'] == 'failed':
-                logger.warning("Last sync failed", last_sync=last_sync)
+        # Database is not known to be thread-safe, so both of its calls share
+        # one worker thread; only the Airtable probe runs alongside them
+        db_result, airtable_result = await asyncio.gather(
+            asyncio.to_thread(self._check_database),
+            asyncio.to_thread(self.airtable_sync.health_check),
+            return_exceptions=True
+        )
+        
+        for check, result in (('database', db_result), ('airtable', airtable_result)):
+            if isinstance(result, Exception):
+                logger.error("Health check failed", check=check, error=str(result), exc_info=result)
                 return False
-            
-            logger.info("Health check passed")
-            return True
-            
-        except Exception as e:
-            logger.error("Health check failed", error=str(e), exc_info=True)
+        
+        last_sync = db_result
+        if last_sync and last_sync['status'] == 'failed':
+            logger.warning("Last sync failed", last_sync=last_sync)
             return False
+        
+        logger.info("Health check passed")
+        return True
+    
+    def run_health_check(self):
+        """Run the health check from a scheduler worker thread"""
+        return asyncio.run(self.health_check())
+    
+    def _check_database(self):
+        """Check database connection and return the last sync status"""
+        self.database.health_check()
+        return self.database.get_last_sync_status()
     
     def setup_scheduler(self):
         """Set up scheduled sync jobs"""
-        # Parse cron-like schedule (simplified - daily at specified hour)
-        # For production, consider using a proper cron scheduler like APScheduler
-        schedule.every().day.at("02:00").do(self.run_full_sync)
-        schedule.every().hour.do(self.run_delta_sync)
-        schedule.every(30).minutes.do(self.health_check)
+        # Syncs and health checks share one worker thread so the Database
+        # is never used by two jobs at once; a job queued behind a running sync runs
+        # late rather than being dropped, and coalesce so it runs once
+        # rather than once per missed fire time
+        self.scheduler = AsyncIOScheduler(
+            executors={'sync': ThreadPoolExecutor(1)},
+            job_defaults={'coalesce': True, 'misfire_grace_time': None}
+        )
+        self.scheduler.add_job(self.run_full_sync, CronTrigger.from_crontab(self.sync_schedule), executor='sync')
+        self.scheduler.add_job(self.run_delta_sync, 'interval', hours=1, executor='sync')
+        self.scheduler.add_job(self.run_health_check, 'interval', minutes=30, executor='sync')
         
         logger.info("Sync scheduler configured", schedule=self.sync_schedule)
     
-    def run_continuous(self):
+    async def run_continuous(self):
         """Run continuous sync service with scheduling"""
         logger.info("Starting continuous data sync service")
         
         # Initial health check
-        if not self.health_check():
+        if not await self.health_check():
             logger.error("Initial health check failed, exiting")
             sys.exit(1)
         
@@ -162,22 +181,22 @@ class DataSyncService:
         last_sync = self.database.get_last_successful_sync('airtable_full')
         if not last_sync or (datetime.now() - last_sync).days > 1:
             logger.info("Running initial full sync")
-            self.run_full_sync()
-            self.refresh_materialized_views()
+            await asyncio.to_thread(self.run_full_sync)
+            await asyncio.to_thread(self.refresh_materialized_views)
+        
+        # Wait for a shutdown signal while the scheduler fires jobs
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
         
-        # Start scheduler loop
+        self.scheduler.start()
         logger.info("Data sync service started, waiting for scheduled jobs")
         
-        while True:
-            try:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
-            except KeyboardInterrupt:
-                logger.info("Received shutdown signal, stopping data sync service")
-                break
-            except Exception as e:
-                logger.error("Scheduler error", error=str(e), exc_info=True)
-                time.sleep(300)  # Wait 5 minutes before retrying
+        await stop_event.wait()
+        
+        logger.info("Received shutdown signal, stopping data sync service")
+        self.scheduler.shutdown()
     
     def run_once(self, sync_type='full'):
         """Run sync once and exit (for manual/cron execution)"""
@@ -222,7 +241,7 @@ def main():
         if mode in ['full', 'delta', 'views']:
             sync_service.run_once(mode)
         elif mode == 'health':
-            success = sync_service.health_check()
+            success = asyncio.run(sync_service.health_check())
             sys.exit(0 if success else 1)
         else:
             logger.error("Unknown command", command=mode)
@@ -230,7 +249,7 @@ def main():
             sys.exit(1)
     else:
         # Run continuous service
-        sync_service.run_continuous()
+        asyncio.run(sync_service.run_continuous())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file